@@ -0,0 +1,439 @@
+"""module for benchmarking harvest and echogram throughput against a stored JSON baseline"""
+
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import fsspec
+import resource
+import tempfile
+import platform
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from prefect import flow
+from pathlib import Path
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+from importlib.metadata import version, PackageNotFoundError
+
+from rca_echo_tools.constants import VARIABLES_TO_INCLUDE
+from rca_echo_tools.harvest import (
+    check_root_mode,
+    clean_and_validate_Sv_ds,
+    get_store_state,
+    harvest_raw_file,
+    route_to_group,
+    update_metadata_json,
+    write_Sv_to_store,
+)
+from rca_echo_tools.echogram import render_mvbs_echogram
+
+BENCH_REFDES = "CE04OSPS-PC01B-05-ZPLSCB102"
+BENCH_CHANNELS = [
+    "WBT 545612-15 ES38-7_ES",
+    "WBT 545613-15 ES120-7C_ES",
+    "WBT 545614-15 ES200-7C_ES",
+]
+
+# modes synthetic files are labelled with in turn, primary CW/power goes to the store root
+BENCH_FILE_MODES = [("CW", "power"), ("CW", "power"), ("CW", "power"), ("BB", "complex")]
+
+# True if a larger value is better, used to decide the direction of a regression
+METRIC_HIGHER_IS_BETTER = {
+    "harvest_pings_per_second": True,
+    "harvest_store_objects": False,
+    "harvest_peak_rss_mb": False,
+    "seconds_per_echogram": False,
+    "echogram_peak_rss_mb": False,
+    "raw_pings_per_second": True,
+    "raw_harvest_peak_rss_mb": False,
+}
+
+# deterministic metrics, any change at all fails rather than going through the threshold
+EXACT_METRICS = {"harvest_store_objects"}
+
+PACKAGES_TO_REPORT = ["rca-echo-tools", "echopype", "xarray", "zarr", "numpy", "dask"]
+
+
+def make_synthetic_Sv_ds(
+    file_index: int, pings_per_file: int, range_samples: int, seed: int = 0
+) -> xr.Dataset:
+    """Build a dataset shaped like one raw file's `ep.calibrate.compute_Sv` output. Data is
+    seeded so every run writes identical bytes."""
+    rng = np.random.default_rng(seed + file_index)
+    n_channel = len(BENCH_CHANNELS)
+
+    ping_time = pd.date_range(
+        "2026-01-01", periods=pings_per_file, freq="1s"
+    ) + pd.Timedelta(seconds=file_index * pings_per_file)
+    echo_range = np.broadcast_to(
+        np.arange(range_samples) * 0.0946, (n_channel, pings_per_file, range_samples)
+    ).copy()
+    # backscatter decaying with range plus noise, with some NaN gaps like offset pings
+    Sv = -50 - 0.2 * echo_range + rng.normal(0, 5, echo_range.shape)
+    Sv[:, rng.random(pings_per_file) < 0.01, :] = np.nan
+
+    per_channel = np.ones(n_channel)
+    per_channel_ping = np.ones((n_channel, pings_per_file))
+    dims_cp = ("channel", "ping_time")
+
+    ds_Sv = xr.Dataset(
+        data_vars={
+            "Sv": (("channel", "ping_time", "range_sample"), Sv),
+            "echo_range": (("channel", "ping_time", "range_sample"), echo_range),
+            "equivalent_beam_angle": (dims_cp, -20.7 * per_channel_ping),
+            "gain_correction": (dims_cp, 27.0 * per_channel_ping),
+            "impedance_transceiver": ("channel", 5400.0 * per_channel),
+            "impedance_transducer": ("channel", 75.0 * per_channel),
+            "formula_absorption": ((), "FG"),
+            "receiver_sampling_frequency": ("channel", 1.5e6 * per_channel),
+            "frequency_nominal": ("channel", np.array([38e3, 120e3, 200e3])),
+            "sound_absorption": (dims_cp, 0.01 * per_channel_ping),
+            "sound_speed": (dims_cp, 1480.0 * per_channel_ping),
+            "source_filenames": ("filenames", [f"bench-{file_index:04d}.raw"]),
+            "water_level": ((), 0.0),
+            "temperature": ((), 8.0),  # excluded variable, exercises clean_and_validate
+        },
+        coords={
+            "channel": BENCH_CHANNELS,
+            "ping_time": ping_time,
+            "range_sample": np.arange(range_samples),
+            "filenames": [0],
+        },
+    )
+
+    missing = set(VARIABLES_TO_INCLUDE) - set(ds_Sv.data_vars)
+    if missing:
+        raise ValueError(f"Synthetic dataset is missing harvest variables {sorted(missing)}.")
+
+    return ds_Sv
+
+
+@flow(log_prints=True)
+def bench_harvest(
+    store_path: str, metadata_path: str, n_files: int, pings_per_file: int, range_samples: int
+) -> dict:
+    """Write `n_files` synthetic files to a fresh local store through the harvest write path,
+    routing and metadata update, timing everything but data generation. Every fourth file is
+    labelled BB/complex so mode group writes are exercised alongside the store root."""
+    fs = fsspec.filesystem("file")
+    shutil.rmtree(store_path, ignore_errors=True)
+    if fs.exists(metadata_path):
+        fs.rm(metadata_path)
+
+    store_state = get_store_state(fs, store_path)
+    check_root_mode(store_state, "CW", "power")
+    file_modes = {}
+    elapsed = 0.0
+    for i in range(n_files):
+        # one file in memory at a time, like the harvest flow
+        ds_Sv = make_synthetic_Sv_ds(i, pings_per_file, range_samples)
+        file_waveform_mode, file_encode_mode = BENCH_FILE_MODES[i % len(BENCH_FILE_MODES)]
+        day = pd.Timestamp(ds_Sv["ping_time"].values[0]).strftime("%Y/%m/%d")
+        url = f"bench/{day}/bench-{i:04d}.raw"
+
+        start = time.perf_counter()
+        group = route_to_group(file_waveform_mode, file_encode_mode, "CW", "power")
+        write_Sv_to_store(clean_and_validate_Sv_ds(ds_Sv), store_path, group, store_state, fs)
+        elapsed += time.perf_counter() - start
+
+        file_modes[url] = {
+            "modes": [
+                {
+                    "waveform_mode": file_waveform_mode,
+                    "encode_mode": file_encode_mode,
+                    "group": group,
+                    "channels": BENCH_CHANNELS,
+                }
+            ]
+        }
+        del ds_Sv
+
+    start = time.perf_counter()
+    update_metadata_json(
+        metadata_day_keys=sorted({"/".join(url.split("/")[1:4]) for url in file_modes}),
+        waveform_mode="CW",
+        encode_mode="power",
+        sonar_model="EK80",
+        subdeployment_id="bench",
+        fs=fs,
+        metadata_path=metadata_path,
+        file_modes=file_modes,
+    )
+    elapsed += time.perf_counter() - start
+
+    return {
+        "harvest_pings_per_second": n_files * pings_per_file / elapsed,
+        "harvest_store_objects": count_store_objects(store_path),
+    }
+
+
+@flow(log_prints=True)
+def bench_raw_harvest(
+    raw_files: list[str],
+    store_path: str,
+    sonar_model: str,
+    waveform_mode: str,
+    encode_mode: str,
+    split_modes: bool,
+) -> dict:
+    """Parse, calibrate and write local .raw fixture files with the harvest per-file step."""
+    fs = fsspec.filesystem("file")
+    shutil.rmtree(store_path, ignore_errors=True)
+
+    store_state = get_store_state(fs, store_path)
+    check_root_mode(store_state, waveform_mode, encode_mode)
+    start = time.perf_counter()
+    for raw_file in raw_files:
+        harvest_raw_file(
+            url=raw_file,
+            sonar_model=sonar_model,
+            waveform_mode=waveform_mode,
+            encode_mode=encode_mode,
+            split_modes=split_modes,
+            store_path=store_path,
+            store_state=store_state,
+            fs=fs,
+        )
+    elapsed = time.perf_counter() - start
+
+    # count what actually landed in the root and any mode groups
+    groups = ([None] if store_state["root_has_data"] else []) + sorted(
+        store_state["groups_with_data"]
+    )
+    n_pings = sum(
+        xr.open_zarr(store_path, group=group, consolidated=False).sizes["ping_time"]
+        for group in groups
+    )
+
+    return {"raw_pings_per_second": n_pings / elapsed}
+
+
+@flow(log_prints=True)
+def bench_echogram(
+    store_path: str, output_dir: str, n_echograms: int, ping_time_bin: str, range_bin: str
+) -> dict:
+    """Render echograms from the local store root with the daily echogram code path."""
+    elapsed = []
+    for i in range(n_echograms):
+        start = time.perf_counter()
+        unbinned_ds = xr.open_zarr(store_path, consolidated=False)
+        render_mvbs_echogram(
+            unbinned_ds, BENCH_REFDES, ping_time_bin, range_bin, f"{output_dir}/bench_{i}.png"
+        )
+        elapsed.append(time.perf_counter() - start)
+
+    return {"seconds_per_echogram": float(np.mean(elapsed))}
+
+
+def run_phase(phase_name: str, *args) -> dict:
+    """Run one benchmark phase in a fresh spawned process so its peak RSS is its own."""
+    with ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        future = executor.submit(_run_phase_in_child, phase_name, *args)
+        results, phase_peak_rss_mb = future.result()
+
+    results[f"{phase_name}_peak_rss_mb"] = phase_peak_rss_mb
+    return results
+
+
+def _run_phase_in_child(phase_name: str, *args) -> tuple[dict, float]:
+    # phases are looked up by name, prefect flow objects don't pickle reliably
+    phases = {
+        "harvest": bench_harvest,
+        "echogram": bench_echogram,
+        "raw_harvest": bench_raw_harvest,
+    }
+    results = phases[phase_name](*args)
+    return results, peak_rss_mb()
+
+
+def count_store_objects(store_path: str) -> int:
+    return sum(len(files) for _, _, files in os.walk(store_path))
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is kilobytes on linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def package_versions() -> dict:
+    versions = {}
+    for package in PACKAGES_TO_REPORT:
+        try:
+            versions[package] = version(package)
+        except PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def run_benchmarks(
+    n_files: int = 8,
+    pings_per_file: int = 1800,
+    range_samples: int = 1000,
+    n_echograms: int = 3,
+    repeat: int = 3,
+    ping_time_bin: str = "4s",
+    range_bin: str = "0.1m",
+    raw_files: list[str] | None = None,
+    sonar_model: str = "EK80",
+    waveform_mode: str = "CW",
+    encode_mode: str = "power",
+    split_modes: bool = False,
+) -> dict:
+    """Run every benchmark `repeat` times in a scratch directory, each phase in its own
+    process. Every metric keeps the best repeat to damp scheduler noise."""
+    if not raw_files:
+        print(
+            "WARNING: no --raw-file given, echopype parse and calibrate (open_raw, compute_Sv) "
+            "are not benchmarked."
+        )
+
+    metrics = {}
+    with tempfile.TemporaryDirectory(prefix="rca-echo-bench-") as tmp_dir:
+        store_path = f"{tmp_dir}/bench.zarr"
+
+        for i in range(repeat):
+            print(f"------ Benchmark repeat {i + 1}/{repeat} ------")
+            results = run_phase(
+                "harvest",
+                store_path,
+                f"{tmp_dir}/harvest-status.json",
+                n_files,
+                pings_per_file,
+                range_samples,
+            )
+            results.update(
+                run_phase(
+                    "echogram",
+                    store_path,
+                    tmp_dir,
+                    n_echograms,
+                    ping_time_bin,
+                    range_bin,
+                )
+            )
+            if raw_files:
+                results.update(
+                    run_phase(
+                        "raw_harvest",
+                        raw_files,
+                        f"{tmp_dir}/bench_raw.zarr",
+                        sonar_model,
+                        waveform_mode,
+                        encode_mode,
+                        split_modes,
+                    )
+                )
+
+            for name, value in results.items():
+                if name not in metrics:
+                    metrics[name] = value
+                elif METRIC_HIGHER_IS_BETTER[name]:
+                    metrics[name] = max(metrics[name], value)
+                else:
+                    metrics[name] = min(metrics[name], value)
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "packages": package_versions(),
+        "params": {
+            "n_files": n_files,
+            "pings_per_file": pings_per_file,
+            "range_samples": range_samples,
+            "n_echograms": n_echograms,
+            "repeat": repeat,
+            "ping_time_bin": ping_time_bin,
+            "range_bin": range_bin,
+            "raw_files": [Path(f).name for f in raw_files or []],
+            "sonar_model": sonar_model,
+            "waveform_mode": waveform_mode,
+            "encode_mode": encode_mode,
+            "split_modes": split_modes,
+        },
+        "metrics": metrics,
+    }
+
+
+def compare_to_baseline(
+    results: dict, baseline: dict, threshold: float, allow_param_mismatch: bool = False
+) -> tuple[str, bool]:
+    """Return a readable metric by metric diff and whether the comparison failed. It fails if
+    any metric regressed by more than `threshold` (a fraction, 0.2 is 20% worse than baseline),
+    if an exact metric such as the store object count changed at all, if a metric is missing
+    on either side, or if benchmark params differ from the baseline unless
+    `allow_param_mismatch`."""
+    lines = []
+    failed = False
+
+    if results["params"] != baseline.get("params"):
+        if allow_param_mismatch:
+            lines.append("WARNING: benchmark params differ from baseline, continuing anyway.")
+        else:
+            lines.append("ERROR: benchmark params differ from baseline, not comparable.")
+            failed = True
+        baseline_params = baseline.get("params", {})
+        for key in sorted(set(results["params"]) | set(baseline_params)):
+            if results["params"].get(key) != baseline_params.get(key):
+                lines.append(
+                    f"  {key}: {baseline_params.get(key)} -> {results['params'].get(key)}"
+                )
+
+    for package, current_version in results["packages"].items():
+        baseline_version = baseline.get("packages", {}).get(package)
+        if baseline_version != current_version:
+            lines.append(f"{package}: {baseline_version} -> {current_version}")
+
+    lines.append(f"{'metric':<28}{'baseline':>14}{'current':>14}{'change':>10}  status")
+    baseline_metrics = baseline.get("metrics", {})
+    for name, higher_is_better in METRIC_HIGHER_IS_BETTER.items():
+        current = results["metrics"].get(name)
+        previous = baseline_metrics.get(name)
+        if current is None and previous is None:
+            continue
+        if current is None or previous is None:
+            missing_from = "current run" if current is None else "baseline"
+            lines.append(f"{name:<28}{'':>38}  ERROR: missing from {missing_from}")
+            failed = True
+            continue
+
+        if previous:
+            change = (current - previous) / previous
+        else:
+            # any move off a zero baseline is an unbounded relative change
+            change = 0.0 if current == previous else math.copysign(math.inf, current)
+        worse_by = -change if higher_is_better else change
+        status = "ok"
+        if name in EXACT_METRICS:
+            if current != previous:
+                status = "CHANGED"
+                failed = True
+        elif worse_by > threshold:
+            status = "REGRESSION"
+            failed = True
+        elif worse_by < -threshold:
+            status = "improved"
+
+        lines.append(f"{name:<28}{previous:>14.3f}{current:>14.3f}{change:>+10.1%}  {status}")
+
+    return "\n".join(lines), failed
+
+
+def load_baseline(baseline_path: str) -> dict:
+    with open(baseline_path, "r") as f:
+        return json.load(f)
+
+
+def save_results(results: dict, path: str):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
@@ -9,19 +9,28 @@ from rca_echo_tools.constants import VIZ_BUCKET
 
 @task
 def sync_png_to_s3(instrument: str, date: str, fs_kwargs: dict, local_dir: Path):
-    """sync .nc and .png files to S3 based on the given date and refdes."""
+    """sync the daily echogram .png for the given date and instrument to S3. Only that day's
+    file is uploaded, other days in `local_dir` may still be being written by parallel runs."""
     year = datetime.strptime(date, "%Y/%m/%d").year
     s3_fs = fsspec.filesystem("s3", **fs_kwargs)
 
-    def is_valid_file(fp: Path):
-        filename = fp.name
+    # Upload .png file to echograms/YYYY/
+    fp = local_dir / f"{instrument}_{date.replace('/', '')}.png"
+    if fp.is_file():
+        s3_uri = f"{VIZ_BUCKET}/echograms/{year}/{instrument}/{fp.name}"
+        print(f"Uploading {fp} to {s3_uri}")
+        s3_fs.put(str(fp), s3_uri)
+    else:
+        print(f"No echogram found at {fp}, nothing to upload")
 
-        return instrument in filename and str(year) in filename
 
-    # Upload .png files to spectrograms/YYYY/
-    png_files = local_dir.glob("*ZPLS*.png")
-    for fp in png_files:
+@task
+def sync_range_echogram_to_s3(instrument: str, fs_kwargs: dict, files: list[Path]):
+    """sync range echogram .png and reduced grid .nc files to S3."""
+    s3_fs = fsspec.filesystem("s3", **fs_kwargs)
+
+    for fp in files:
         if fp.is_file():
-            s3_uri = f"{VIZ_BUCKET}/echograms/{year}/{instrument}/{fp.name}"
+            s3_uri = f"{VIZ_BUCKET}/echograms/range/{instrument}/{fp.name}"
             print(f"Uploading {fp} to {s3_uri}")
             s3_fs.put(str(fp), s3_uri)
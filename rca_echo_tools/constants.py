@@ -53,6 +53,13 @@ VARIABLES_TO_INCLUDE = [
 
 DEFAULT_HARVEST_DEPLOYMENT = "echo_raw_data_harvest_8vcpu_60gb"
 
+# zarr attribute on the store root recording the waveform/encode mode of its data
+ROOT_MODE_ATTR = "harvest_mode"
+
+# refuse range echogram grids above this many (channel, ping_time, echo_range) cells,
+# sums + counts cost 16 bytes per cell so this is ~320 MB
+RANGE_ECHOGRAM_MAX_GRID_CELLS = 20_000_000
+
 ECHOGRAM_INFRA_CONFIG = yaml.safe_load(resources.files("rca_echo_tools.config").joinpath("config.yaml").open("r"))
 
 SUBDEPLOYMENTS = yaml.safe_load(resources.files("rca_echo_tools.config").joinpath("processing_deployments.yaml").open("r"))
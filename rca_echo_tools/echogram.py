@@ -1,4 +1,7 @@
 import roseus.mpl as rs
+import numpy as np
+import pandas as pd
+import xarray as xr
 import echopype as ep
 import matplotlib.pyplot as plt
 
@@ -6,9 +9,20 @@ from datetime import datetime, timedelta
 from pathlib import Path
 from prefect import flow
 
-from rca_echo_tools.constants import SUBDEPLOYMENTS, SUFFIX, VIZ_BUCKET
-from rca_echo_tools.utils import load_data, restore_logging_for_prefect, get_s3_kwargs, find_subdeployment
-from rca_echo_tools.cloud import sync_png_to_s3
+from rca_echo_tools.constants import (
+    SUBDEPLOYMENTS,
+    SUFFIX,
+    VIZ_BUCKET,
+    RANGE_ECHOGRAM_MAX_GRID_CELLS,
+)
+from rca_echo_tools.utils import (
+    load_data,
+    restore_logging_for_prefect,
+    get_s3_kwargs,
+    find_subdeployment,
+    verify_subdeployment,
+)
+from rca_echo_tools.cloud import sync_png_to_s3, sync_range_echogram_to_s3
 
 plt.switch_backend("Agg")  # use non-interactive backend for plotting
 
@@ -29,6 +43,17 @@ def plot_daily_echogram(
     """
     restore_logging_for_prefect()
     s3_kwargs = get_s3_kwargs()
+
+    png_path = render_daily_echogram(date, refdes, ping_time_bin, range_bin)
+
+    if s3_sync:
+        print(f"Syncing echograms to {VIZ_BUCKET}")
+        sync_png_to_s3(refdes[-9:], date, s3_kwargs, png_path.parent)
+
+
+def render_daily_echogram(date: str, refdes: str, ping_time_bin: str, range_bin: str) -> Path:
+    """Load one day of Sv and save its echogram PNG, returns the PNG path. Plain function so
+    local worker processes can run it without a prefect flow run."""
     print(
         f"---- Launching: daily echogram for {refdes} on {date} with"
         f" ping_time_bin={ping_time_bin} and range_bin={range_bin} ----"
@@ -50,17 +75,233 @@ def plot_daily_echogram(
     if len(unbinned_ds_day["ping_time"]) == 0:
         raise ValueError(f"No data found for {refdes} on {date}.")
 
+    png_path = output_dir / f"{instrument}_{date_tag}.png"
+    render_mvbs_echogram(unbinned_ds_day, refdes, ping_time_bin, range_bin, str(png_path))
+
+    return png_path
+
+
+@flow(log_prints=True)
+def plot_range_echogram(
+    start_date: str,
+    end_date: str,
+    refdes: str,
+    ping_time_bin: str = "1h",
+    range_bin: str = "1m",
+    max_range: float | None = None,
+    s3_sync: bool = False,
+):
+    """
+    Echogram over an arbitrary date range (week, month, whole subdeployment) at coarse bins.
+    Rather than loading the range and calling commongrid, the subdeployment store is reduced
+    one ping_time chunk at a time into running linear-domain Sv sums and sample counts on a
+    fixed (channel, ping_time, echo_range) grid, so memory is bounded by the output grid plus
+    a single store chunk. Writes one PNG and a NetCDF of the reduced grid.
+    """
+    restore_logging_for_prefect()
+    s3_kwargs = get_s3_kwargs()
+    print(
+        f"---- Launching: range echogram for {refdes} from {start_date} to {end_date} with"
+        f" ping_time_bin={ping_time_bin} and range_bin={range_bin} ----"
+    )
+
+    start_dt = datetime.strptime(start_date, "%Y/%m/%d")
+    end_dt = datetime.strptime(end_date, "%Y/%m/%d")
+    subdeployment_id = verify_subdeployment(refdes, start_dt, end_dt)
+
+    output_dir = Path("./output/range")
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    instrument = refdes[-9:]
+    file_tag = f"{instrument}_{start_date.replace('/', '')}_{end_date.replace('/', '')}"
+
+    # label slices include both ends, stop 1 ns short so midnight after end_date is excluded
+    range_end = pd.Timestamp(end_dt + timedelta(days=1)) - pd.Timedelta(1, "ns")
+    unbinned_ds = load_data(f"{refdes}-{SUFFIX}/{subdeployment_id}")
+    unbinned_ds_range = unbinned_ds.sel(ping_time=slice(start_dt, range_end))
+
+    if len(unbinned_ds_range["ping_time"]) == 0:
+        raise ValueError(f"No data found for {refdes} between {start_date} and {end_date}.")
+
+    sv = unbinned_ds_range["Sv"].transpose("channel", "ping_time", "range_sample")
+    echo_range = unbinned_ds_range["echo_range"].transpose(
+        "channel", "ping_time", "range_sample"
+    )
+
+    time_step = pd.Timedelta(ping_time_bin).to_timedelta64()
+    range_step = _parse_range_bin(range_bin)
+    time_origin = np.datetime64(start_dt, "ns")
+    time_end = np.datetime64(end_dt + timedelta(days=1), "ns")
+    n_time = int(np.ceil((time_end - time_origin) / time_step))
+
+    # with max_range the range axis is fixed, otherwise it starts empty and grows as deeper
+    # chunks arrive so echo_range is only read once, by the reduction itself
+    if max_range is not None:
+        if not np.isfinite(max_range) or max_range < 0:
+            raise ValueError(f"Invalid max_range {max_range}.")
+        n_range = int(np.floor(max_range / range_step)) + 1
+    else:
+        n_range = 0
+    _check_grid_size((sv.sizes["channel"], n_time, max(n_range, 1)))
+    sums = np.zeros((sv.sizes["channel"], n_time, n_range), dtype="float64")
+    counts = np.zeros(sums.shape, dtype="int64")
+
+    # dask chunk boundaries survive the .sel above, an in-memory store is a single chunk
+    ping_chunks = sv.chunksizes.get("ping_time", (sv.sizes["ping_time"],))
+    print(f"Reducing {sv.sizes['ping_time']} pings in {len(ping_chunks)} chunks.")
+
+    n_clipped = 0
+    chunk_start = 0
+    for i, chunk_len in enumerate(ping_chunks):
+        chunk = slice(chunk_start, chunk_start + chunk_len)
+        chunk_start += chunk_len
+
+        sv_chunk = sv.isel(ping_time=chunk).values
+        echo_range_chunk = echo_range.isel(ping_time=chunk).values
+        time_idx = (sv["ping_time"].values[chunk] - time_origin) // time_step
+
+        if max_range is None and np.isfinite(echo_range_chunk).any():
+            chunk_n_range = int(np.floor(np.nanmax(echo_range_chunk) / range_step)) + 1
+            if chunk_n_range > sums.shape[2]:
+                _check_grid_size(sums.shape[:2] + (chunk_n_range,))
+                sums, counts = _grow_range_axis(sums, counts, chunk_n_range)
+
+        if sums.shape[2] > 0:  # empty until a chunk with valid echo_range arrives
+            n_clipped += _accumulate_linear_sv(
+                sums, counts, sv_chunk, echo_range_chunk, time_idx, range_step
+            )
+        del sv_chunk, echo_range_chunk  # free up memory
+
+        if (i + 1) % 50 == 0:
+            print(f"Reduced {i + 1}/{len(ping_chunks)} chunks.")
+
+    if sums.shape[2] == 0:
+        raise ValueError(
+            f"No valid echo_range for {refdes} between {start_date} and {end_date}."
+        )
+    print(f"Reduced grid shape (channel, ping_time, echo_range): {sums.shape}")
+
+    if n_clipped > 0:
+        print(f"WARNING: {n_clipped} Sv samples fell outside the reduced grid, dropped.")
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_sv = 10 * np.log10(sums / counts)
+
+    ds_binned = xr.Dataset(
+        data_vars={
+            "Sv": (("channel", "ping_time", "echo_range"), mean_sv, {"units": "dB re 1 m-1"}),
+            "sample_count": (("channel", "ping_time", "echo_range"), counts),
+        },
+        coords={
+            "channel": sv["channel"].values,
+            "ping_time": time_origin + np.arange(n_time) * time_step,
+            "echo_range": np.arange(sums.shape[2]) * range_step,
+        },
+        attrs={
+            "refdes": refdes,
+            "subdeployment_id": str(subdeployment_id),
+            "ping_time_bin": ping_time_bin,
+            "range_bin": range_bin,
+            "comment": "Sv averaged in the linear domain, bin labels are left edges.",
+        },
+    )
+
+    nc_path = output_dir / f"{file_tag}.nc"
+    png_path = output_dir / f"{file_tag}.png"
+
+    print(f"Writing reduced grid to {nc_path}")
+    ds_binned.to_netcdf(nc_path)
+    _plot_sv_facets(ds_binned, refdes, ping_time_bin, range_bin, str(png_path))
+
+    if s3_sync:
+        print(f"Syncing range echogram to {VIZ_BUCKET}")
+        sync_range_echogram_to_s3(instrument, s3_kwargs, [png_path, nc_path])
+
+
+def render_mvbs_echogram(
+    unbinned_ds: xr.Dataset, refdes: str, ping_time_bin: str, range_bin: str, output_path: str
+):
+    """Grid calibrated Sv with echopype commongrid and save the echogram to `output_path`."""
     print("Downsampling data with ep commongrid to deal with offset ping nans.")
     # Reduce data based on sample number
     ds_MVBS = ep.commongrid.compute_MVBS(
-        unbinned_ds_day,  # calibrated Sv dataset
+        unbinned_ds,  # calibrated Sv dataset
         # range_bin_num=30,  # number of sample bins to average along the range_bin dimensionm
         ping_time_bin=ping_time_bin,
         range_bin=range_bin,
     )
 
+    _plot_sv_facets(ds_MVBS, refdes, ping_time_bin, range_bin, output_path)
+
+
+def _parse_range_bin(range_bin: str) -> float:
+    """Convert an echopype style range bin label such as '0.5m' to meters."""
+    value = range_bin.strip().removesuffix("m")
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"range_bin must be in meters, e.g. '1m', got {range_bin!r}.")
+
+
+def _check_grid_size(grid_shape: tuple[int, ...]):
+    """Raise if a reduced grid of `grid_shape` would exceed RANGE_ECHOGRAM_MAX_GRID_CELLS."""
+    grid_cells = int(np.prod(grid_shape))
+    if grid_cells > RANGE_ECHOGRAM_MAX_GRID_CELLS:
+        raise ValueError(
+            f"Reduced grid {grid_shape} has {grid_cells} cells, more than the "
+            f"{RANGE_ECHOGRAM_MAX_GRID_CELLS} limit. Use a coarser ping_time_bin or range_bin."
+        )
+
+
+def _grow_range_axis(
+    sums: np.ndarray, counts: np.ndarray, n_range: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Zero pad the echo_range axis of the running grid out to `n_range` bins."""
+    pad = ((0, 0), (0, 0), (0, n_range - sums.shape[2]))
+    return np.pad(sums, pad), np.pad(counts, pad)
+
+
+def _accumulate_linear_sv(
+    sums: np.ndarray,
+    counts: np.ndarray,
+    sv_chunk: np.ndarray,
+    echo_range_chunk: np.ndarray,
+    time_idx: np.ndarray,
+    range_step: float,
+) -> int:
+    """Add one (channel, ping_time, range_sample) chunk of Sv into the running grid in place.
+    NaN samples are skipped. Returns the number of valid samples that fell outside the grid
+    and were dropped. Work and temporaries scale with the chunk, not the grid."""
+    n_channel, n_time, n_range = sums.shape
+
+    range_idx = np.floor(echo_range_chunk / range_step)
+    time_idx = np.broadcast_to(time_idx[None, :, None], sv_chunk.shape)
+    channel_idx = np.broadcast_to(np.arange(n_channel)[:, None, None], sv_chunk.shape)
+
+    finite = np.isfinite(sv_chunk) & np.isfinite(range_idx)
+    valid = (
+        finite
+        & (range_idx >= 0)
+        & (range_idx < n_range)
+        & (time_idx >= 0)
+        & (time_idx < n_time)
+    )
+    flat_idx = np.ravel_multi_index(
+        (channel_idx[valid], time_idx[valid], range_idx[valid].astype("int64")), sums.shape
+    )
+
+    np.add.at(sums.reshape(-1), flat_idx, 10 ** (sv_chunk[valid] / 10))
+    np.add.at(counts.reshape(-1), flat_idx, 1)
+
+    return int(np.count_nonzero(finite)) - len(flat_idx)
+
+
+def _plot_sv_facets(
+    ds_binned: xr.Dataset, refdes: str, ping_time_bin: str, range_bin: str, output_path: str
+):
+    """Render gridded Sv as one row per channel and save the figure to `output_path`."""
     # Map full channel strings to clean frequency labels
-    channels = ds_MVBS["channel"].values
+    channels = ds_binned["channel"].values
     channel_labels = {ch: ch for ch in channels}  # fallback
     freq_map = {"38": "38 kHz", "120": "120 kHz", "200": "200 kHz"}
     for ch in channels:
@@ -76,11 +317,11 @@ def plot_daily_echogram(
         return float("inf")  # unknown channels go last
 
     channels = sorted(channels, key=extract_freq)
-    ds_MVBS = ds_MVBS.sel(channel=channels)
+    ds_binned = ds_binned.sel(channel=channels)
 
 
     print("Plotting downsampled array.")
-    facet_grid = ds_MVBS["Sv"].plot(
+    facet_grid = ds_binned["Sv"].plot(
         x="ping_time", row="channel", figsize=(18, 10), vmin=-90, vmax=-40, cmap=rs.roseus
     )
 
@@ -105,8 +346,5 @@ def plot_daily_echogram(
     )
     fig.suptitle(refdes, fontsize=12, fontweight='bold', y=0.99, x=0.12)
 
-    plt.savefig(f"{str(output_dir)}/{instrument}_{date_tag}.png")
-
-    if s3_sync:
-        print(f"Syncing echograms to {VIZ_BUCKET}")
-        sync_png_to_s3(instrument, date, s3_kwargs, output_dir)
+    plt.savefig(output_path)
+    plt.close(fig)
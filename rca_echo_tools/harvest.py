@@ -13,6 +13,7 @@ from rca_echo_tools.constants import (
     VARIABLES_TO_EXCLUDE,
     VARIABLES_TO_INCLUDE,
     METADATA_JSON_BUCKET, 
+    ROOT_MODE_ATTR,
 )
 from rca_echo_tools.utils import get_s3_kwargs, restore_logging_for_prefect, verify_subdeployment
 
@@ -28,7 +29,15 @@ def echo_raw_data_harvest(
     data_bucket: str,
     run_type: str,
     batch_size_days: int = 1,
+    split_modes: bool = False,
 ):
+    """
+    Parse, calibrate and write .raw files for a date range to the subdeployment zarr store.
+    With `split_modes`, each file's transmit configuration is inspected instead of assuming
+    `waveform_mode`/`encode_mode` for the whole range. Files in that primary mode are written
+    to the store root as usual, files in any other mode are calibrated with their own mode and
+    written to a zarr group named after it (e.g. `BB_complex`) in the same store.
+    """
     restore_logging_for_prefect()
 
     fs_kwargs = get_s3_kwargs()
@@ -59,13 +68,14 @@ def echo_raw_data_harvest(
                 "the entire date range."
             )
 
-    store_exists = fs.exists(store_path)
-    if run_type == "refresh" and store_exists:
+    store_state = get_store_state(fs, store_path)
+    if run_type == "refresh" and store_state["store_exists"]:
         raise FileExistsError(
             "`--refresh` specified, but zarr store already exists. Please either "
             "delete existing store and run refesh again, or specify `--append` if you just wish to modify "
             "existing store."
         )
+    check_root_mode(store_state, waveform_mode, encode_mode)
     if run_type == "refresh":
         print(f"WIPING EXISTING METADATA JSON for subdeployment {subdeployment_id}")
         if fs.exists(metadata_json_path):
@@ -105,36 +115,22 @@ def echo_raw_data_harvest(
             batch_start = batch_end + timedelta(days=1)
             continue
 
-        # 2. Parse + compute Sv for this batch
+        # 2. Parse + compute Sv and write / append to Zarr for this batch
+        file_modes = {}
         for url in batch_urls:
-            print(f"Parsing raw data for {url}.")
-            ed = ep.open_raw(url, sonar_model=sonar_model)
-            print(f"Computing Sv for {url}.")
-            ds_Sv = ep.calibrate.compute_Sv(
-                ed,
+            file_modes[url] = harvest_raw_file(
+                url=url,
+                sonar_model=sonar_model,
                 waveform_mode=waveform_mode,
                 encode_mode=encode_mode,
-            )
-
-            # variable validation here in future if needed
-            ds_Sv = clean_and_validate_Sv_ds(ds_Sv)
-            del ed
-
-            # 3. Write / append to Zarr
-            write_mode = "w" if not store_exists else "a"
-
-            print("------ Writing backscatter variables to Zarr store. ------")
-            ds_Sv.to_zarr(
-                store_path,
-                mode=write_mode,
-                append_dim="ping_time" if store_exists else None,
+                split_modes=split_modes,
+                store_path=store_path,
+                store_state=store_state,
+                fs=fs,
                 storage_options=fs_kwargs,
             )
 
-            store_exists = True
-            del ds_Sv  # free up memory
-
-        # 4. Move to next batch
+        # 3. Move to next batch
         print("------ Updating metadata JSON. ------")
         update_metadata_json(
             metadata_day_keys=batch_days_strings,
@@ -144,11 +140,192 @@ def echo_raw_data_harvest(
             subdeployment_id=subdeployment_id,
             fs=fs,
             metadata_path=metadata_json_path,
+            file_modes=file_modes if split_modes else None,
         )
         batch_start = batch_end + timedelta(days=1)
         # NOTE no metadata consolidation in zarr v3
 
 
+def harvest_raw_file(
+    url: str,
+    sonar_model: str,
+    waveform_mode: str,
+    encode_mode: str,
+    split_modes: bool,
+    store_path: str,
+    store_state: dict,
+    fs: fsspec.filesystem,
+    storage_options: dict | None = None,
+) -> dict:
+    """Parse, calibrate and write one .raw file. With `split_modes` the file's channels are
+    calibrated per transmit mode and each subset is routed on its own. Returns the file's
+    routing decisions for the harvest metadata JSON."""
+    print(f"Parsing raw data for {url}.")
+    ed = ep.open_raw(url, sonar_model=sonar_model)
+
+    if split_modes:
+        modes, skipped_channels, file_channels = detect_transmit_modes(
+            ed, sonar_model, waveform_mode, encode_mode
+        )
+        if not modes:
+            # record and move on rather than failing the rest of the run
+            print(f"Skipping {url}, no channel can be calibrated: {skipped_channels}")
+            return {
+                "modes": [],
+                "skipped": "no channel can be calibrated",
+                "skipped_channels": skipped_channels,
+            }
+    else:
+        modes, skipped_channels, file_channels = [(waveform_mode, encode_mode, None)], {}, None
+
+    records = []
+    for file_waveform_mode, file_encode_mode, channels in modes:
+        group = route_to_group(
+            file_waveform_mode, file_encode_mode, waveform_mode, encode_mode
+        )
+
+        print(f"Computing Sv for {url} with {file_waveform_mode}/{file_encode_mode}.")
+        ds_Sv = ep.calibrate.compute_Sv(
+            ed,
+            waveform_mode=file_waveform_mode,
+            encode_mode=file_encode_mode,
+        )
+
+        if channels is not None:
+            returned = set(ds_Sv["channel"].values)
+            for ch in channels:
+                if ch not in returned:
+                    skipped_channels[ch] = "not returned by compute_Sv for " + (
+                        f"{file_waveform_mode}/{file_encode_mode}"
+                    )
+            channels = [ch for ch in channels if ch in returned]
+            if not channels:
+                continue
+            # keep only this mode's channels, other channels are NaN padded so every write
+            # carries the file's full channel set
+            ds_Sv = ds_Sv.sel(channel=channels).reindex(channel=file_channels)
+
+        # variable validation here in future if needed
+        ds_Sv = clean_and_validate_Sv_ds(ds_Sv)
+
+        write_Sv_to_store(ds_Sv, store_path, group, store_state, fs, storage_options)
+        del ds_Sv  # free up memory
+
+        records.append(
+            {
+                "waveform_mode": file_waveform_mode,
+                "encode_mode": file_encode_mode,
+                "group": group,
+                "channels": channels,
+            }
+        )
+    del ed
+
+    if skipped_channels:
+        print(f"WARNING: channels not harvested from {url}: {skipped_channels}")
+
+    record = {"modes": records}
+    if skipped_channels:
+        record["skipped_channels"] = skipped_channels
+    return record
+
+
+def get_store_state(fs: fsspec.filesystem, store_path: str) -> dict:
+    """What is already in the store, updated by `write_Sv_to_store` as files are written."""
+    # a split run can leave a store holding only mode groups, so check for root arrays
+    root_has_data = fs.exists(f"{store_path}/Sv")
+
+    root_mode = None
+    if root_has_data:
+        # zarr v3 root group metadata, attributes hold the mode the root was written in
+        with fs.open(f"{store_path}/zarr.json", "r") as f:
+            root_mode = json.load(f).get("attributes", {}).get(ROOT_MODE_ATTR)
+
+    return {
+        "store_exists": fs.exists(store_path),
+        "root_has_data": root_has_data,
+        "root_mode": root_mode,
+        "groups_with_data": set(),
+        "channels": {},  # channel order of each written target, None is the root
+    }
+
+
+def check_root_mode(store_state: dict, waveform_mode: str, encode_mode: str):
+    """Refuse a run whose primary mode differs from the mode already in the store root, so
+    one mode is never appended onto another. Sets the root mode for new stores."""
+    primary_mode = mode_group_name(waveform_mode, encode_mode)
+    root_mode = store_state["root_mode"]
+
+    if root_mode is None:
+        if store_state["root_has_data"]:
+            print(
+                f"WARNING: store root has no {ROOT_MODE_ATTR} attribute, assuming it holds "
+                f"{primary_mode} data and recording that on the next write."
+            )
+        store_state["root_mode"] = primary_mode
+    elif root_mode != primary_mode:
+        raise ValueError(
+            f"Store root holds {root_mode} data but this run's primary mode is "
+            f"{primary_mode}. "
+            f"Rerun with --waveform-mode/--encode-mode matching {root_mode}, with "
+            f"--split-modes {primary_mode} files will go to the {primary_mode} group."
+        )
+
+
+def write_Sv_to_store(
+    ds_Sv: xr.Dataset,
+    store_path: str,
+    group: str | None,
+    store_state: dict,
+    fs: fsspec.filesystem,
+    storage_options: dict | None = None,
+):
+    """Write or append one file's Sv to the store root, or to mode group `group` if set."""
+    if group is None:
+        # never "w" once anything is in the store, it would wipe mode groups too
+        write_mode = "w" if not store_state["store_exists"] else "a"
+        target_has_data = store_state["root_has_data"]
+        store_state["root_has_data"] = True
+        if store_state["root_mode"] is not None:
+            ds_Sv = ds_Sv.assign_attrs({ROOT_MODE_ATTR: store_state["root_mode"]})
+    else:
+        groups_with_data = store_state["groups_with_data"]
+        if group not in groups_with_data and fs.exists(f"{store_path}/{group}/Sv"):
+            groups_with_data.add(group)
+        write_mode = "a"
+        target_has_data = group in groups_with_data
+        groups_with_data.add(group)
+
+    channels = store_state["channels"]
+    if target_has_data:
+        if group not in channels:
+            existing = xr.open_zarr(
+                store_path, group=group, consolidated=False, storage_options=storage_options
+            )
+            channels[group] = list(existing["channel"].values)
+        extra = set(ds_Sv["channel"].values) - set(channels[group])
+        if extra:
+            raise ValueError(
+                f"Channels {sorted(extra)} are not in store group {group or '/'}, "
+                "appending would misalign channels."
+            )
+        # zarr appends positionally, line channels up with what is already stored
+        ds_Sv = ds_Sv.reindex(channel=channels[group])
+    else:
+        channels[group] = list(ds_Sv["channel"].values)
+
+    print(f"------ Writing backscatter variables to Zarr store group {group or '/'}. ------")
+    ds_Sv.to_zarr(
+        store_path,
+        group=group,
+        mode=write_mode,
+        append_dim="ping_time" if target_has_data else None,
+        storage_options=storage_options,
+    )
+
+    store_state["store_exists"] = True
+
+
 @task
 def update_metadata_json(
     metadata_day_keys: list[str],
@@ -158,6 +335,7 @@ def update_metadata_json(
     subdeployment_id: str,
     fs: fsspec.filesystem,
     metadata_path: str,
+    file_modes: dict | None = None,
 ):
     # Build new entries for this run
     new_entries = {
@@ -170,6 +348,27 @@ def update_metadata_json(
         for day in metadata_day_keys
     }
 
+    # record per file routing decisions under the day the file was found in, the modes
+    # actually used replace the run wide waveform_mode/encode_mode
+    if file_modes is not None:
+        for day, entry in new_entries.items():
+            day_files = {
+                url.split("/")[-1]: modes
+                for url, modes in file_modes.items()
+                if f"/{day}/" in url
+            }
+            del entry["waveform_mode"], entry["encode_mode"]
+            entry["split_modes"] = True
+            entry["primary_mode"] = mode_group_name(waveform_mode, encode_mode)
+            entry["modes_used"] = sorted(
+                {
+                    mode_group_name(mode["waveform_mode"], mode["encode_mode"])
+                    for record in day_files.values()
+                    for mode in record["modes"]
+                }
+            )
+            entry["files"] = day_files
+
     # Load existing metadata
     if fs.exists(metadata_path):
         with fs.open(metadata_path, "r") as f:
@@ -184,6 +383,103 @@ def update_metadata_json(
         json.dump(final_metadata, f, indent=2)
 
 
+def detect_transmit_modes(
+    ed: ep.echodata.EchoData,
+    sonar_model: str,
+    primary_waveform_mode: str,
+    primary_encode_mode: str,
+) -> tuple[list[tuple[str, str, list[str]]], dict, list[str]]:
+    """Decide per channel which (waveform_mode, encode_mode) to calibrate with, from the
+    channel's transmit type and which sample encodings it recorded. EK80 files often mix CW
+    and FM channels, and BB calibration only covers the FM ones, so each mode gets its own
+    channel subset. CW channels use the primary encode mode whenever they have that data,
+    so they land in the store root.
+
+    Returns the modes as (waveform_mode, encode_mode, channels), the channels that cannot
+    be calibrated in any mode with the reason, and all of the file's channels in order."""
+    beam = ed["Sonar/Beam_group1"]
+    file_channels = [str(ch) for ch in beam["channel"].values]
+
+    if sonar_model.upper() != "EK80":
+        return [("CW", "power", file_channels)], {}, file_channels  # EK60 is CW power only
+
+    # complex samples go in Beam_group1, power goes in Beam_group2 when both were recorded
+    if "backscatter_i" in beam.data_vars:
+        complex_beam = beam
+        power_beam = (
+            ed["Sonar/Beam_group2"] if "Sonar/Beam_group2" in ed.group_paths else None
+        )
+    else:
+        complex_beam, power_beam = None, beam
+
+    complex_channels = set()
+    transmit_types = {}
+    if complex_beam is not None:
+        for ch in complex_beam["channel"].values:
+            types = complex_beam["transmit_type"].sel(channel=ch).values.ravel()
+            transmit_types[str(ch)] = set(str(t) for t in types)
+            complex_channels.add(str(ch))
+    power_channels = set()
+    if power_beam is not None:
+        for ch in power_beam["channel"].values:
+            power_channels.add(str(ch))
+            if str(ch) not in file_channels:
+                file_channels.append(str(ch))
+            if str(ch) not in transmit_types:
+                types = power_beam["transmit_type"].sel(channel=ch).values.ravel()
+                transmit_types[str(ch)] = set(str(t) for t in types)
+
+    channel_modes = {}
+    skipped_channels = {}
+    for ch in file_channels:
+        if not transmit_types[ch] <= {"CW"}:
+            if ch in complex_channels:
+                channel_modes[ch] = ("BB", "complex")
+            else:
+                skipped_channels[ch] = (
+                    f"FM transmit types {sorted(transmit_types[ch])} without complex samples"
+                )
+            continue
+
+        available = set()
+        if ch in complex_channels:
+            available.add("complex")
+        if ch in power_channels:
+            available.add("power")
+        if primary_waveform_mode.upper() == "CW" and primary_encode_mode.lower() in available:
+            channel_modes[ch] = ("CW", primary_encode_mode.lower())
+        else:
+            channel_modes[ch] = ("CW", "power" if "power" in available else "complex")
+
+    modes = {}
+    for ch in file_channels:
+        if ch in channel_modes:
+            modes.setdefault(channel_modes[ch], []).append(ch)
+
+    print(f"Detected transmit types {transmit_types}, channel modes {channel_modes}.")
+    return (
+        [(waveform, encode, chs) for (waveform, encode), chs in modes.items()],
+        skipped_channels,
+        file_channels,
+    )
+
+
+def mode_group_name(waveform_mode: str, encode_mode: str) -> str:
+    return f"{waveform_mode.upper()}_{encode_mode.lower()}"
+
+
+def route_to_group(
+    file_waveform_mode: str,
+    file_encode_mode: str,
+    primary_waveform_mode: str,
+    primary_encode_mode: str,
+) -> str | None:
+    """None (store root) for files in the primary mode, else the mode group name."""
+    group = mode_group_name(file_waveform_mode, file_encode_mode)
+    primary_group = mode_group_name(primary_waveform_mode, primary_encode_mode)
+    return None if group == primary_group else group
+
+
 @task
 def get_raw_urls(day_str: str, refdes: str):
 
@@ -1,5 +1,10 @@
+import os
+import json
 import click
+import multiprocessing
 
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from prefect.deployments import run_deployment
 from datetime import datetime, timedelta, timezone
 
@@ -8,9 +13,15 @@ from rca_echo_tools.constants import (
     DATA_BUCKET,
     DEFAULT_HARVEST_DEPLOYMENT,
     ECHOGRAM_INFRA_CONFIG,
+    SUBDEPLOYMENTS,
 )
-from rca_echo_tools.utils import select_logger
-from rca_echo_tools.echogram import plot_daily_echogram
+from rca_echo_tools.utils import select_logger, restore_logging_for_prefect, get_s3_kwargs
+from rca_echo_tools.echogram import (
+    plot_daily_echogram,
+    plot_range_echogram,
+    render_daily_echogram,
+)
+from rca_echo_tools.cloud import sync_png_to_s3
 
 # get yesterday's date in YYYY/MM/DD format
 now_utc = datetime.now(timezone.utc)
@@ -59,6 +70,14 @@ yesterday = yesterday_utc.strftime("%Y/%m/%d")
     show_default=True,
     help="Flag to indicate if harvest should run on RCA cloud.",
 )
+@click.option(
+    "--split-modes",
+    type=bool,
+    default=False,
+    show_default=True,
+    help="Detect CW/FM per file. Files not in --waveform-mode/--encode-mode are calibrated with "
+    "their own mode and written to a mode specific group (e.g. BB_complex) in the same store.",
+)
 def run_echo_raw_data_harvest(
     start_date: str,
     end_date: str,
@@ -70,6 +89,7 @@ def run_echo_raw_data_harvest(
     run_type: str,
     batch_size_days: int = 2,
     cloud: bool = False,
+    split_modes: bool = False,
 ) -> None:
 
     logger = select_logger()
@@ -87,6 +107,7 @@ def run_echo_raw_data_harvest(
             "data_bucket": data_bucket,
             "run_type": run_type,
             "batch_size_days": batch_size_days,
+            "split_modes": split_modes,
         }
 
         run_deployment(
@@ -108,6 +129,7 @@ def run_echo_raw_data_harvest(
             data_bucket=data_bucket,
             run_type=run_type,
             batch_size_days=batch_size_days,
+            split_modes=split_modes,
         )
 
 
@@ -153,6 +175,22 @@ def run_echo_raw_data_harvest(
     show_default=True,
     help="Whether to sync resulting echogram PNGs to s3.",
 )
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of local worker processes, one day per process. "
+    "Ignored with --parallel-in-cloud.",
+)
+@click.option(
+    "--worker-memory-gb",
+    type=click.FloatRange(min=0, min_open=True),
+    default=None,
+    help="Per-worker virtual address space limit (RLIMIT_AS) in GB for local multi-process "
+    "runs. This is not an RSS limit, dask and s3fs threads reserve address space, so workers "
+    "can hit MemoryError well below this value. Leave headroom. Default is no limit.",
+)
 def run_daily_echograms(
     refdes: str,
     start_date: str,
@@ -161,6 +199,8 @@ def run_daily_echograms(
     range_bin: str,
     parallel_in_cloud: bool,
     s3_sync: bool,
+    workers: int = 1,
+    worker_memory_gb: float | None = None,
 ):
     start_dt = datetime.strptime(start_date, "%Y/%m/%d")
     end_dt = datetime.strptime(end_date, "%Y/%m/%d") if end_date else start_dt
@@ -178,10 +218,28 @@ def run_daily_echograms(
         for d in dt_list
     ]
 
-    # Dispatch — same loop, different runner
-    runner = _run_cloud if parallel_in_cloud else _run_local
-    for params in all_params:
-        runner(params)
+    if parallel_in_cloud:
+        for params in all_params:
+            _run_cloud(params)
+        return
+
+    # failures are collected per day and reported at the end, not raised at the first one
+    failures = {}
+    if workers > 1:
+        _run_local_pool(all_params, workers, worker_memory_gb, failures)
+    else:
+        for params in all_params:
+            try:
+                _run_local(params)
+                print(f"Finished echogram for {params['date']}")
+            except Exception as e:
+                failures[params["date"]] = f"{type(e).__name__}: {e}"
+                print(f"Echogram for {params['date']} failed: {failures[params['date']]}")
+
+    print(f"{len(all_params) - len(failures)}/{len(all_params)} daily echograms succeeded")
+    if failures:
+        summary = "\n".join(f"  {d}: {msg}" for d, msg in sorted(failures.items()))
+        raise click.ClickException(f"{len(failures)} daily echogram(s) failed:\n{summary}")
 
 
 def _run_cloud(params):
@@ -201,6 +259,304 @@ def _run_local(params):
     plot_daily_echogram(**params)
 
 
+def _run_local_worker(params):
+    """Body of a local pool worker. Calls plain functions rather than the prefect flow and
+    tasks, so N workers don't each start their own ephemeral prefect server."""
+    restore_logging_for_prefect()
+    png_path = render_daily_echogram(
+        params["date"], params["refdes"], params["ping_time_bin"], params["range_bin"]
+    )
+    if params["s3_sync"]:
+        instrument = params["refdes"][-9:]
+        sync_png_to_s3.fn(instrument, params["date"], get_s3_kwargs(), png_path.parent)
+
+
+def _init_local_worker(memory_limit_gb: float | None):
+    """Runs once in each worker process before any echogram is rendered."""
+    if memory_limit_gb is not None:
+        import resource
+
+        # RLIMIT_AS caps virtual address space, not resident memory
+        limit = int(memory_limit_gb * 1024**3)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _run_local_pool(
+    all_params: list[dict], workers: int, worker_memory_gb: float | None, failures: dict
+):
+    """Render days in a local process pool, one day per task, adding failed days to
+    `failures` rather than aborting the remaining days. If a worker dies outright
+    the pool breaks and every pending day with it, so those days are rerun one process per day
+    to find out which of them actually fails."""
+    workers = min(workers, len(all_params))
+    print(f"Launching {len(all_params)} daily echograms locally on {workers} worker processes")
+
+    # spawned workers read this when they first import matplotlib, which happens while
+    # unpickling the initializer (pipeline -> echogram -> pyplot), before it runs
+    os.environ["MPLBACKEND"] = "Agg"
+
+    unfinished = _run_pool_round(all_params, workers, worker_memory_gb, failures, True)
+
+    if unfinished:
+        print(
+            f"A worker process died, rerunning {len(unfinished)} unfinished days "
+            "in one process per day"
+        )
+        with ThreadPoolExecutor(max_workers=workers) as threads:
+            list(
+                threads.map(
+                    lambda params: _run_pool_round(
+                        [params], 1, worker_memory_gb, failures, False
+                    ),
+                    unfinished,
+                )
+            )
+
+
+def _run_pool_round(
+    all_params: list[dict],
+    workers: int,
+    worker_memory_gb: float | None,
+    failures: dict,
+    defer_broken: bool,
+) -> list[dict]:
+    """Run one process pool over `all_params`, adding failed days to `failures`. With
+    `defer_broken`, days lost to a broken pool are returned instead of counted as failures."""
+    unfinished = []
+    # spawn rather than fork, prefect and s3fs hold threads and event loops in the parent
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_local_worker,
+        initargs=(worker_memory_gb,),
+    ) as executor:
+        futures = {executor.submit(_run_local_worker, params): params for params in all_params}
+        for future in as_completed(futures):
+            date_str = futures[future]["date"]
+            try:
+                future.result()
+                print(f"Finished echogram for {date_str}")
+            except BrokenProcessPool as e:
+                if defer_broken:
+                    unfinished.append(futures[future])
+                    continue
+                failures[date_str] = (
+                    f"worker process died, killed for memory or crashed in C code ({e})"
+                )
+                print(f"Echogram for {date_str} failed: {failures[date_str]}")
+            except Exception as e:
+                failures[date_str] = f"{type(e).__name__}: {e}"
+                print(f"Echogram for {date_str} failed: {failures[date_str]}")
+
+    return unfinished
+
+
+@click.command()
+@click.option(
+    "--refdes", required=True, type=str, help="Reference designator of the echosounder"
+)
+@click.option("--start-date", type=str, default=None, help="Start date in YYYY/MM/DD format")
+@click.option("--end-date", type=str, default=None, help="End date in YYYY/MM/DD format")
+@click.option(
+    "--subdeployment",
+    type=int,
+    default=None,
+    help="Subdeployment id, plots the full subdeployment in place of --start-date/--end-date",
+)
+@click.option(
+    "--ping-time-bin",
+    required=False,
+    type=str,
+    default="1h",
+    help="Time bin size for ping_time dimension default is 1h",
+)
+@click.option(
+    "--range-bin",
+    required=False,
+    type=str,
+    default="1m",
+    help="Range bin size for range dimension, default is 1m",
+)
+@click.option(
+    "--max-range",
+    type=float,
+    default=None,
+    help="Deepest range bin in meters, default is the max echo_range over the date range",
+)
+@click.option(
+    "--s3-sync",
+    type=bool,
+    default=False,
+    show_default=True,
+    help="Whether to sync resulting echogram PNG and NetCDF to s3.",
+)
+def run_range_echogram(
+    refdes: str,
+    start_date: str,
+    end_date: str,
+    subdeployment: int,
+    ping_time_bin: str,
+    range_bin: str,
+    max_range: float,
+    s3_sync: bool,
+):
+    if subdeployment is not None:
+        if start_date or end_date:
+            raise click.UsageError("Specify either --subdeployment or --start-date/--end-date.")
+        if subdeployment not in SUBDEPLOYMENTS[refdes]:
+            raise click.BadParameter(
+                f"{subdeployment} not in {list(SUBDEPLOYMENTS[refdes])} for {refdes}",
+                param_hint="--subdeployment",
+            )
+        start_date, end_date = SUBDEPLOYMENTS[refdes][subdeployment]
+        end_date = end_date or yesterday  # open ended subdeployment
+    elif start_date is None:
+        raise click.UsageError("Specify either --subdeployment or --start-date.")
+
+    plot_range_echogram(
+        start_date=start_date,
+        end_date=end_date or start_date,
+        refdes=refdes,
+        ping_time_bin=ping_time_bin,
+        range_bin=range_bin,
+        max_range=max_range,
+        s3_sync=s3_sync,
+    )
+
+
+@click.command()
+@click.option(
+    "--baseline",
+    type=click.Path(dir_okay=False),
+    default="bench_baseline.json",
+    show_default=True,
+    help="Baseline JSON to compare against, or to write with --save-baseline.",
+)
+@click.option(
+    "--save-baseline",
+    is_flag=True,
+    default=False,
+    help="Write this run's results as the new baseline instead of comparing.",
+)
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Also write this run's results to a JSON file.",
+)
+@click.option(
+    "--threshold",
+    type=click.FloatRange(min=0),
+    default=0.2,
+    show_default=True,
+    help="Fail if any metric is worse than baseline by more than this fraction.",
+)
+@click.option(
+    "--allow-param-mismatch",
+    is_flag=True,
+    default=False,
+    help="Compare even if benchmark options differ from the baseline's. Fails by default.",
+)
+@click.option("--n-files", type=click.IntRange(min=1), default=8, show_default=True)
+@click.option("--pings-per-file", type=click.IntRange(min=1), default=1800, show_default=True)
+@click.option("--range-samples", type=click.IntRange(min=1), default=1000, show_default=True)
+@click.option("--n-echograms", type=click.IntRange(min=1), default=3, show_default=True)
+@click.option(
+    "--repeat",
+    type=click.IntRange(min=1),
+    default=3,
+    show_default=True,
+    help="Repeats per benchmark, the best repeat is kept.",
+)
+@click.option(
+    "--raw-file",
+    "raw_files",
+    type=click.Path(exists=True, dir_okay=False),
+    multiple=True,
+    help="Local .raw fixture to parse, calibrate and write. Can be given more than once.",
+)
+@click.option("--sonar-model", type=str, default="EK80", show_default=True)
+@click.option(
+    "--waveform-mode",
+    type=click.Choice(["CW", "BB"], case_sensitive=False),
+    default="CW",
+    show_default=True,
+)
+@click.option(
+    "--encode-mode",
+    type=click.Choice(["power", "complex"], case_sensitive=False),
+    default="power",
+    show_default=True,
+)
+@click.option(
+    "--split-modes",
+    type=bool,
+    default=False,
+    show_default=True,
+    help="Run --raw-file fixtures through harvest CW/FM split routing.",
+)
+def run_bench(
+    baseline: str,
+    save_baseline: bool,
+    output: str,
+    threshold: float,
+    allow_param_mismatch: bool,
+    n_files: int,
+    pings_per_file: int,
+    range_samples: int,
+    n_echograms: int,
+    repeat: int,
+    raw_files: tuple[str],
+    sonar_model: str,
+    waveform_mode: str,
+    encode_mode: str,
+    split_modes: bool,
+):
+    # imported here so the other entry points don't pay for it
+    from rca_echo_tools.bench import (
+        run_benchmarks,
+        compare_to_baseline,
+        load_baseline,
+        save_results,
+    )
+
+    results = run_benchmarks(
+        n_files=n_files,
+        pings_per_file=pings_per_file,
+        range_samples=range_samples,
+        n_echograms=n_echograms,
+        repeat=repeat,
+        raw_files=list(raw_files),
+        sonar_model=sonar_model,
+        waveform_mode=waveform_mode,
+        encode_mode=encode_mode,
+        split_modes=split_modes,
+    )
+    print(json.dumps(results["metrics"], indent=2))
+
+    if output:
+        save_results(results, output)
+
+    if save_baseline:
+        save_results(results, baseline)
+        print(f"Saved baseline to {baseline}")
+        return
+
+    if not os.path.exists(baseline):
+        raise click.ClickException(
+            f"Baseline {baseline} not found, run with --save-baseline to create it."
+        )
+
+    diff, failed = compare_to_baseline(
+        results, load_baseline(baseline), threshold, allow_param_mismatch
+    )
+    print(diff)
+    if failed:
+        raise click.ClickException(
+            f"Benchmark comparison against {baseline} failed, see the diff above."
+        )
+
+
 if __name__ == "__main__":
     #run_echo_raw_data_harvest()
     run_daily_echograms()